@@ -1,13 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import contextlib
 import math
 import os.path as osp
 import tempfile
+import types
 from unittest import TestCase
 
+import numpy as np
 import torch
-import torch.nn.functional as F
 import torch.optim as optim
 
+from mmengine.logging import MMLogger
 from mmengine.optim import OptimWrapper
 # yapf: disable
 from mmengine.optim.scheduler import (ConstantParamScheduler,
@@ -24,35 +27,99 @@ from mmengine.optim.scheduler import (ConstantParamScheduler,
 from mmengine.testing import assert_allclose
 
 
+def _exp_targets(lr, gamma, n):
+    return (lr * np.power(gamma, np.arange(n))).tolist()
+
+
+def _cos_targets(lr, eta_min, T, n):
+    k = np.arange(n)
+    return (eta_min + (lr - eta_min) *
+            (1 + np.cos(np.pi * k / T)) / 2).tolist()
+
+
+def _noop_step(optimizer, *args, **kwargs):
+    pass
+
+
+def _skip_optimizer_step(optimizer):
+    """Replace ``optimizer.step`` with a no-op bound method.
+
+    It must be called before building the scheduler, which wraps the bound
+    method to count the steps of the optimizer.
+    """
+    optimizer.step = types.MethodType(_noop_step, optimizer)
+
+
 class ToyModel(torch.nn.Module):
+    """Only the parameters are used to build the optimizer, so plain
+    ``nn.Parameter`` are enough and avoid the initialization of conv
+    layers."""
 
     def __init__(self):
         super().__init__()
-        self.conv1 = torch.nn.Conv2d(1, 1, 1)
-        self.conv2 = torch.nn.Conv2d(1, 1, 1)
-
-    def forward(self, x):
-        return self.conv2(F.relu(self.conv1(x)))
+        self.p1 = torch.nn.Parameter(torch.zeros(1))
+        self.p2 = torch.nn.Parameter(torch.zeros(1))
 
 
 class TestParameterScheduler(TestCase):
+    layer2_mult = 10
+    # Arguments which should make ``LinearParamScheduler`` raise ValueError
+    LINEAR_INVALID_CASES = [
+        dict(start_factor=10, end=900),
+        dict(start_factor=-1, end=900),
+        dict(end_factor=1.001, end=900),
+        dict(end_factor=-0.00001, end=900)
+    ]
+    # Targets of the first param group, which only depend on the
+    # literal hyper-parameters and are computed once at class creation.
+    _STEP_TARGETS = [0.05] * 3 + [0.005] * 3 + [0.0005] * 3 + [0.00005] * 3
+    _STEP_MOMENTUM_TARGETS = [0.01] * 2 + [0.001] * 2
+    _MULTI_STEP_TARGETS = [0.05] * 2 + [0.005] * 3 + [0.0005] * 4 + [0.00005
+                                                                     ] * 3
+    _EXP_TARGETS = _exp_targets(0.05, 0.9, 10)
+    _LINEAR_MULTI_STEP_TARGETS = [0.025, 0.03125, 0.0375, 0.04375
+                                  ] + [0.05] * 4 + [0.005] * 3 + [0.0005] * 1
+    _OVERLAP_TARGETS = [0.025, 0.03125, 0.0375, 0.004375
+                        ] + [0.005] * 2 + [0.0005] * 3 + [0.00005] * 1
+    # Shared by the exp/cosine multi-scheduler tests: an exponential phase
+    # in the first 5 epochs followed by 5 epochs of cosine annealing which
+    # starts from the last exponential value.
+    _EXP5 = _exp_targets(0.05, 0.9, 5)
+    _EXP5_COS5_ETA_MIN = 1e-10
+    _EXP5_COS5 = _cos_targets(_EXP5[-1], _EXP5_COS5_ETA_MIN, 5, 5)
+    # Hyper-parameters and targets of both param groups of
+    # ``test_cos_anneal_scheduler``
+    _COS_EPOCHS = 12
+    _COS_T_MAX = 10
+    _COS_ETA_MIN = 5e-3
+    _COS_TARGETS = [
+        _cos_targets(0.05, _COS_ETA_MIN, _COS_T_MAX, _COS_EPOCHS),
+        _cos_targets(0.05 * layer2_mult, _COS_ETA_MIN, _COS_T_MAX, _COS_EPOCHS)
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        """Setup the model shared by all test methods.
+
+        Schedulers only touch the param groups of the optimizer, so the
+        parameters of the model can be safely reused across test methods.
+        """
+        cls.model = ToyModel()
 
     def setUp(self):
-        """Setup the model and optimizer which are used in every test method.
+        """Setup the optimizer which is used in every test method.
 
         TestCase calls functions in this order: setUp() -> testMethod() ->
         tearDown() -> cleanUp()
         """
-        self.model = ToyModel()
-        self.layer2_mult = 10
         lr = 0.05
         momentum = 0.01
         weight_decay = 5e-4
         self.optimizer = optim.SGD(
             [{
-                'params': self.model.conv1.parameters()
+                'params': [self.model.p1]
             }, {
-                'params': self.model.conv2.parameters(),
+                'params': [self.model.p2],
                 'lr': lr * self.layer2_mult,
                 'momentum': momentum * self.layer2_mult,
                 'weight_decay': weight_decay * self.layer2_mult
@@ -97,34 +164,37 @@ class TestParameterScheduler(TestCase):
 
         # test manually resume with ``last_step`` instead of load_state_dict
         epochs = 10
-        targets = [0.05 * (0.9**x) for x in range(epochs)]
+        targets = _exp_targets(0.05, 0.9, epochs)
         scheduler = ExponentialParamScheduler(
             self.optimizer, param_name='lr', gamma=0.9)
 
-        results = []
+        # 5 values are recorded before resuming and 6 values after it
+        results = [0.0] * (5 + 6)
+        idx = 0
+        sch_step = scheduler.step
         for epoch in range(5):
-            results.append(self.optimizer.param_groups[0]['lr'])
+            results[idx] = self.optimizer.param_groups[0]['lr']
+            idx += 1
             # The order should be
             # train_epoch() -> save_checkpoint() -> scheduler.step().
             # Break at here to simulate the checkpoint is saved before
             # the scheduler.step().
             if epoch == 4:
                 break
-            scheduler.step()
+            sch_step()
         scheduler2 = ExponentialParamScheduler(
             self.optimizer, param_name='lr', gamma=0.9, last_step=4)
+        sch_step = scheduler2.step
         for epoch in range(6):
-            results.append(self.optimizer.param_groups[0]['lr'])
-            scheduler2.step()
+            results[idx] = self.optimizer.param_groups[0]['lr']
+            idx += 1
+            sch_step()
 
         for epoch in range(epochs):
-            assert_allclose(
-                targets[epoch],
-                results[epoch],
+            self.assertTrue(
+                math.isclose(targets[epoch], results[epoch], abs_tol=1e-5),
                 msg='lr is wrong in epoch {}: expected {}, got {}'.format(
-                    epoch, targets[epoch], results[epoch]),
-                atol=1e-5,
-                rtol=0)
+                    epoch, targets[epoch], results[epoch]))
 
     def test_scheduler_before_optim_warning(self):
         """warns if scheduler is used before optimizer."""
@@ -158,6 +228,7 @@ class TestParameterScheduler(TestCase):
                               call_sch_before_optim_resume)
 
     def test_get_last_value(self):
+        _skip_optimizer_step(self.optimizer)
         epochs = 10
         single_targets = [0.05] * 3 + [0.005] * 3 + [0.0005] * 3 + [0.00005]
         targets = [
@@ -165,33 +236,36 @@ class TestParameterScheduler(TestCase):
         ]
         scheduler = StepParamScheduler(
             self.optimizer, param_name='lr', step_size=3, gamma=0.1)
+        # Bind after the scheduler is built since it wraps `optimizer.step`.
+        opt_step = self.optimizer.step
+        sch_step = scheduler.step
         for epoch in range(epochs):
             result = scheduler.get_last_value()
             if isinstance(scheduler.optimizer, OptimWrapper) \
                     and scheduler.optimizer.base_param_settings is not None:
                 result.pop()
-            self.optimizer.step()
-            scheduler.step()
+            opt_step()
+            sch_step()
             target = [t[epoch] for t in targets]
             for t, r in zip(target, result):
-                assert_allclose(
-                    target,
-                    result,
+                self.assertTrue(
+                    math.isclose(t, r, abs_tol=1e-5),
                     msg='LR is wrong in epoch {}: expected {}, got {}'.format(
-                        epoch, t, r),
-                    atol=1e-5,
-                    rtol=0)
+                        epoch, t, r))
 
     def test_scheduler_step_count(self):
+        _skip_optimizer_step(self.optimizer)
         iteration = 10
         scheduler = StepParamScheduler(
             self.optimizer, param_name='lr', gamma=0.1, step_size=3)
         self.assertEqual(scheduler.last_step, 0)
         target = [i + 1 for i in range(iteration)]
         step_counts = []
+        opt_step = self.optimizer.step
+        sch_step = scheduler.step
         for i in range(iteration):
-            self.optimizer.step()
-            scheduler.step()
+            opt_step()
+            sch_step()
             step_counts.append(scheduler.last_step)
         self.assertEqual(step_counts, target)
 
@@ -252,53 +326,66 @@ class TestParameterScheduler(TestCase):
             step_kwargs = [step_kwarg for _ in range(epochs)]
         else:  # step_kwargs is not None
             assert len(step_kwargs) == epochs
-            assert len(step_kwargs[0]) == len(schedulers)
+            # every epoch needs the kwargs of every scheduler, otherwise
+            # ``zip`` below would silently skip stepping some of them
+            for kwargs in step_kwargs:
+                assert len(kwargs) == len(schedulers)
+        param_groups = self.optimizer.param_groups
+        steps = tuple(scheduler.step for scheduler in schedulers)
         for epoch in range(epochs):
-            for param_group, target in zip(self.optimizer.param_groups,
-                                           targets):
-                assert_allclose(
-                    target[epoch],
-                    param_group[param_name],
-                    msg='{} is wrong in epoch {}: expected {}, got {}'.format(
-                        param_name, epoch, target[epoch],
-                        param_group[param_name]),
-                    atol=1e-5,
-                    rtol=0)
-            [
-                scheduler.step(**step_kwargs[epoch][i])
-                for i, scheduler in enumerate(schedulers)
-            ]
+            for param_group, target in zip(param_groups, targets):
+                value = param_group[param_name]
+                msg = '{} is wrong in epoch {}: expected {}, got {}'.format(
+                    param_name, epoch, target[epoch], value)
+                if isinstance(value, torch.Tensor):
+                    assert_allclose(
+                        target[epoch], value, msg=msg, atol=1e-5, rtol=0)
+                else:
+                    self.assertTrue(
+                        math.isclose(target[epoch], value, abs_tol=1e-5),
+                        msg=msg)
+            for step, kwargs in zip(steps, step_kwargs[epoch]):
+                step(**kwargs)
 
     def test_step_scheduler(self):
-        # lr = 0.05     if epoch < 3
-        # lr = 0.005    if 3 <= epoch < 6
-        # lr = 0.0005   if 6 <= epoch < 9
-        # lr = 0.00005  if epoch >=9
-        epochs = 10
-        single_targets = [0.05] * 3 + [0.005] * 3 + [0.0005] * 3 + [0.00005
-                                                                    ] * 3
-        targets = [
-            single_targets, [x * self.layer2_mult for x in single_targets]
-        ]
-        scheduler = StepParamScheduler(
-            self.optimizer,
-            param_name='lr',
-            gamma=0.1,
-            step_size=3,
-            verbose=True)
-        self._test_scheduler_value(scheduler, targets, epochs)
-
-        # momentum = 0.01     if epoch < 2
-        # momentum = 0.001    if 2 <= epoch < 4
-        epochs = 4
-        single_targets = [0.01] * 2 + [0.001] * 2
-        targets = [
-            single_targets, [x * self.layer2_mult for x in single_targets]
+        cases = [
+            # lr = 0.05     if epoch < 3
+            # lr = 0.005    if 3 <= epoch < 6
+            # lr = 0.0005   if 6 <= epoch < 9
+            # lr = 0.00005  if epoch >=9
+            dict(
+                param_name='lr',
+                epochs=10,
+                single_targets=self._STEP_TARGETS,
+                kwargs=dict(gamma=0.1, step_size=3, verbose=True)),
+            # momentum = 0.01     if epoch < 2
+            # momentum = 0.001    if 2 <= epoch < 4
+            dict(
+                param_name='momentum',
+                epochs=4,
+                single_targets=self._STEP_MOMENTUM_TARGETS,
+                kwargs=dict(gamma=0.1, step_size=2)),
         ]
-        scheduler = StepParamScheduler(
-            self.optimizer, param_name='momentum', gamma=0.1, step_size=2)
-        self._test_scheduler_value(
-            scheduler, targets, epochs, param_name='momentum')
+        for case in cases:
+            param_name = case['param_name']
+            single_targets = case['single_targets']
+            targets = [
+                single_targets, [x * self.layer2_mult for x in single_targets]
+            ]
+            # Capture the verbose logs instead of writing them to stdout
+            if case['kwargs'].get('verbose', False):
+                log_ctx = self.assertLogs(
+                    MMLogger.get_current_instance(), level='INFO')
+            else:
+                log_ctx = contextlib.nullcontext()
+            with self.subTest(param_name=param_name), log_ctx:
+                scheduler = StepParamScheduler(
+                    self.optimizer, param_name=param_name, **case['kwargs'])
+                self._test_scheduler_value(
+                    scheduler, targets, case['epochs'], param_name=param_name)
+            # reset the scheduled value instead of rebuilding the optimizer
+            for group in self.optimizer.param_groups:
+                group[param_name] = group[f'initial_{param_name}']
 
     def test_multi_step_scheduler(self):
         # lr = 0.05     if epoch < 2
@@ -306,8 +393,7 @@ class TestParameterScheduler(TestCase):
         # lr = 0.0005   if 5 <= epoch < 9
         # lr = 0.00005   if epoch >= 9
         epochs = 10
-        single_targets = [0.05] * 2 + [0.005] * 3 + [0.0005] * 4 + [0.00005
-                                                                    ] * 3
+        single_targets = self._MULTI_STEP_TARGETS
         targets = [
             single_targets, [x * self.layer2_mult for x in single_targets]
         ]
@@ -332,18 +418,9 @@ class TestParameterScheduler(TestCase):
         self._test_scheduler_value(scheduler, targets, epochs)
 
     def test_linear_scheduler(self):
-        with self.assertRaises(ValueError):
-            LinearParamScheduler(
-                self.optimizer, param_name='lr', start_factor=10, end=900)
-        with self.assertRaises(ValueError):
-            LinearParamScheduler(
-                self.optimizer, param_name='lr', start_factor=-1, end=900)
-        with self.assertRaises(ValueError):
-            LinearParamScheduler(
-                self.optimizer, param_name='lr', end_factor=1.001, end=900)
-        with self.assertRaises(ValueError):
-            LinearParamScheduler(
-                self.optimizer, param_name='lr', end_factor=-0.00001, end=900)
+        for case in self.LINEAR_INVALID_CASES:
+            with self.subTest(**case), self.assertRaises(ValueError):
+                LinearParamScheduler(self.optimizer, param_name='lr', **case)
         # lr = 0.025     if epoch == 0
         # lr = 0.03125   if epoch == 1
         # lr = 0.0375    if epoch == 2
@@ -369,9 +446,10 @@ class TestParameterScheduler(TestCase):
 
     def test_exp_scheduler(self):
         epochs = 10
-        single_targets = [0.05 * (0.9**x) for x in range(epochs)]
+        single_targets = self._EXP_TARGETS
         targets = [
-            single_targets, [x * self.layer2_mult for x in single_targets]
+            single_targets,
+            (np.asarray(single_targets) * self.layer2_mult).tolist()
         ]
         scheduler = ExponentialParamScheduler(
             self.optimizer, param_name='lr', gamma=0.9)
@@ -385,33 +463,20 @@ class TestParameterScheduler(TestCase):
                 T_max=10,
                 eta_min=0,
                 eta_min_ratio=0.1)
-        epochs = 12
-        t = 10
-        eta_min = 5e-3
-        targets1 = [
-            eta_min + (0.05 - eta_min) * (1 + math.cos(math.pi * x / t)) / 2
-            for x in range(epochs)
-        ]
-        targets2 = [
-            eta_min + (0.5 - eta_min) * (1 + math.cos(math.pi * x / t)) / 2
-            for x in range(epochs)
-        ]
-        targets = [targets1, targets2]
+        epochs = self._COS_EPOCHS
+        t = self._COS_T_MAX
+        eta_min = self._COS_ETA_MIN
         scheduler = CosineAnnealingParamScheduler(
             self.optimizer, param_name='lr', T_max=t, eta_min=eta_min)
-        self._test_scheduler_value(scheduler, targets, epochs)
+        self._test_scheduler_value(scheduler, self._COS_TARGETS, epochs)
 
         # Test `eta_min_ratio`
-        self.setUp()
+        for group in self.optimizer.param_groups:
+            group['lr'] = group['initial_lr']
         eta_min_ratio = 1e-3
-        targets1 = [
-            0.05 * eta_min_ratio + (0.05 - 0.05 * eta_min_ratio) *
-            (1 + math.cos(math.pi * x / t)) / 2 for x in range(epochs)
-        ]
-        targets2 = [
-            0.5 * eta_min_ratio + (0.5 - 0.5 * eta_min_ratio) *
-            (1 + math.cos(math.pi * x / t)) / 2 for x in range(epochs)
-        ]
+        targets1 = _cos_targets(0.05, 0.05 * eta_min_ratio, t, epochs)
+        lr2 = 0.05 * self.layer2_mult
+        targets2 = _cos_targets(lr2, lr2 * eta_min_ratio, t, epochs)
         targets = [targets1, targets2]
         scheduler = CosineAnnealingParamScheduler(
             self.optimizer,
@@ -485,14 +550,8 @@ class TestParameterScheduler(TestCase):
         epochs = 10
         t = 10
         eta_min = 5e-3
-        targets1 = [
-            eta_min + (0.05 - eta_min) * (1 + math.cos(math.pi * x / t)) / 2
-            for x in range(epochs)
-        ]
-        targets2 = [
-            eta_min + (0.5 - eta_min) * (1 + math.cos(math.pi * x / t)) / 2
-            for x in range(epochs)
-        ]
+        targets1 = _cos_targets(0.05, eta_min, t, epochs)
+        targets2 = _cos_targets(0.5, eta_min, t, epochs)
         targets = [targets1, targets2]
         scheduler = CosineRestartParamScheduler(
             self.optimizer,
@@ -572,9 +631,9 @@ class TestParameterScheduler(TestCase):
             # reset the state of optimizers
             self.optimizer = optim.SGD(
                 [{
-                    'params': self.model.conv1.parameters()
+                    'params': [self.model.p1]
                 }, {
-                    'params': self.model.conv2.parameters(),
+                    'params': [self.model.p2],
                     'lr': lr * self.layer2_mult,
                     'momentum': momentum * self.layer2_mult,
                     'weight_decay': weight_decay * self.layer2_mult
@@ -678,6 +737,7 @@ class TestParameterScheduler(TestCase):
             step_kwargs = [{} for _ in range(epochs)]
         else:  # step_kwargs is not None
             assert len(step_kwargs) == epochs
+        _skip_optimizer_step(self.optimizer)
         scheduler = construct()
         for epoch in range(epochs):
             scheduler.optimizer.step()
@@ -960,8 +1020,7 @@ class TestParameterScheduler(TestCase):
     def test_multi_scheduler_without_overlap_linear_multi_step(self):
         # use Linear in the first 5 epochs and then use MultiStep
         epochs = 12
-        single_targets = [0.025, 0.03125, 0.0375, 0.04375
-                          ] + [0.05] * 4 + [0.005] * 3 + [0.0005] * 1
+        single_targets = self._LINEAR_MULTI_STEP_TARGETS
         targets = [
             single_targets, [x * self.layer2_mult for x in single_targets]
         ]
@@ -980,27 +1039,27 @@ class TestParameterScheduler(TestCase):
             end=12)
         self._test_scheduler_value([scheduler1, scheduler2], targets, epochs)
 
+    def _exp_phase1(self):
+        """Build the exponential scheduler of the first 5 epochs used by the
+        multi-scheduler tests."""
+        return ExponentialParamScheduler(
+            self.optimizer, param_name='lr', gamma=0.9, begin=0, end=5)
+
     def test_multi_scheduler_without_overlap_exp_cosine(self):
         # use Exp in the first 5 epochs and then use Cosine
         epochs = 10
-        single_targets1 = [0.05 * (0.9**x) for x in range(5)]
-        scheduler1 = ExponentialParamScheduler(
-            self.optimizer, param_name='lr', gamma=0.9, begin=0, end=5)
+        scheduler1 = self._exp_phase1()
 
-        eta_min = 1e-10
-        single_targets2 = [
-            eta_min + (single_targets1[-1] - eta_min) *
-            (1 + math.cos(math.pi * x / 5)) / 2 for x in range(5)
-        ]
-        single_targets = single_targets1 + single_targets2
+        single_targets = self._EXP5 + self._EXP5_COS5
         targets = [
-            single_targets, [x * self.layer2_mult for x in single_targets]
+            single_targets,
+            (np.asarray(single_targets) * self.layer2_mult).tolist()
         ]
         scheduler2 = CosineAnnealingParamScheduler(
             self.optimizer,
             param_name='lr',
             T_max=5,
-            eta_min=eta_min,
+            eta_min=self._EXP5_COS5_ETA_MIN,
             begin=5,
             end=10)
 
@@ -1009,8 +1068,7 @@ class TestParameterScheduler(TestCase):
     def test_multi_scheduler_with_overlap(self):
         # use Linear at first 5 epochs together with MultiStep
         epochs = 10
-        single_targets = [0.025, 0.03125, 0.0375, 0.004375
-                          ] + [0.005] * 2 + [0.0005] * 3 + [0.00005] * 1
+        single_targets = self._OVERLAP_TARGETS
         targets = [
             single_targets, [x * self.layer2_mult for x in single_targets]
         ]
@@ -1028,25 +1086,18 @@ class TestParameterScheduler(TestCase):
         # use Exp in the first 5 epochs and the last 5 epochs use Cosine
         # no scheduler in the middle 5 epochs
         epochs = 15
-        single_targets1 = [0.05 * (0.9**x) for x in range(5)]
-        scheduler1 = ExponentialParamScheduler(
-            self.optimizer, param_name='lr', gamma=0.9, begin=0, end=5)
+        scheduler1 = self._exp_phase1()
 
-        eta_min = 1e-10
-        single_targets2 = [
-            eta_min + (single_targets1[-1] - eta_min) *
-            (1 + math.cos(math.pi * x / 5)) / 2 for x in range(5)
-        ]
-        single_targets = single_targets1 + [single_targets1[-1]
-                                            ] * 5 + single_targets2
+        single_targets = self._EXP5 + [self._EXP5[-1]] * 5 + self._EXP5_COS5
         targets = [
-            single_targets, [x * self.layer2_mult for x in single_targets]
+            single_targets,
+            (np.asarray(single_targets) * self.layer2_mult).tolist()
         ]
         scheduler2 = CosineAnnealingParamScheduler(
             self.optimizer,
             param_name='lr',
             T_max=5,
-            eta_min=eta_min,
+            eta_min=self._EXP5_COS5_ETA_MIN,
             begin=10,
             end=15)
 